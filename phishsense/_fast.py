@@ -0,0 +1,194 @@
+"""
+Compiled Feature Kernels
+Numeric URL features computed straight from UTF-8 bytes into a feature-matrix row
+"""
+
+import numpy as np
+from .feature_extractor import FEATURE_ORDER, COUNTED_CHARS
+
+# Optional - JIT-compile the kernel; without numba an equivalent NumPy version is used
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+# Optional - build packed URL buffers in Arrow's native string layout
+try:
+    import pyarrow as pa
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+
+# Model features that depend only on the URL's characters (no parsing needed)
+_COUNT_FEATURES = tuple(
+    (name, ch) for name, ch in COUNTED_CHARS if name in FEATURE_ORDER
+)
+NUMERIC_FEATURES = (
+    ('url_length',) + tuple(name for name, _ in _COUNT_FEATURES) +
+    ('dots_to_length', 'hyphens_to_length')
+)
+
+# Column positions in FEATURE_ORDER. The compiled kernels take them as arguments:
+# numba's on-disk cache freezes the globals a kernel reads and is only invalidated
+# when this file changes, not when FEATURE_ORDER does.
+_URL_LENGTH_COL = FEATURE_ORDER.index('url_length')
+_DOTS_RATIO_COL = FEATURE_ORDER.index('dots_to_length')
+_HYPHENS_RATIO_COL = FEATURE_ORDER.index('hyphens_to_length')
+_COUNT_COLS = np.array([FEATURE_ORDER.index(name) for name, _ in _COUNT_FEATURES], dtype=np.int64)
+_COUNT_BYTES = np.array([ord(ch) for _, ch in _COUNT_FEATURES], dtype=np.int64)
+_LENGTH_COLS = np.array([_URL_LENGTH_COL, _DOTS_RATIO_COL, _HYPHENS_RATIO_COL], dtype=np.int64)
+_DOT = ord('.')
+_HYPHEN = ord('-')
+
+
+def url_to_bytes(url):
+    """UTF-8 bytes of a URL as a uint8 array (a view, no copy)"""
+    return np.frombuffer(url.encode('utf-8', 'surrogatepass'), dtype=np.uint8)
+
+
+def pack_urls(urls):
+    """
+    Concatenate the UTF-8 bytes of many URLs into one ragged buffer
+    
+    Args:
+        urls: Sequence of URL strings
+        
+    Returns:
+        tuple: (buf, offsets) where URL i is buf[offsets[i]:offsets[i + 1]]
+    """
+    if PYARROW_AVAILABLE:
+        try:
+            return _pack_urls_arrow(urls)
+        except (pa.ArrowException, UnicodeEncodeError):
+            pass  # e.g. lone surrogates, which Arrow rejects; encode them below
+    
+    encoded = [url.encode('utf-8', 'surrogatepass') for url in urls]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum(np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded)), out=offsets[1:])
+    buf = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+    return buf, offsets
+
+
+def _pack_urls_arrow(urls):
+    """
+    pack_urls via a pyarrow large_string array, whose value and offset buffers
+    already have the (buf, offsets) layout; both are wrapped without copying
+    """
+    array = pa.array(urls, type=pa.large_string())
+    _, offsets_buffer, data_buffer = array.buffers()
+    offsets = np.frombuffer(offsets_buffer, dtype=np.int64, count=len(array) + 1, offset=array.offset * 8)
+    if data_buffer is None:
+        buf = np.zeros(0, dtype=np.uint8)
+    else:
+        buf = np.frombuffer(data_buffer, dtype=np.uint8)
+    return buf, offsets
+
+
+def _extract_numeric_loop(url_bytes, out, count_cols, count_bytes, length_cols):
+    """
+    Write the NUMERIC_FEATURES of one URL into a feature row
+    
+    Args:
+        url_bytes: URL as a uint8 array (see url_to_bytes)
+        out: Row of length len(FEATURE_ORDER); only NUMERIC_FEATURES columns are written
+        count_cols, count_bytes: _COUNT_COLS and _COUNT_BYTES
+        length_cols: _LENGTH_COLS (url_length, dots_to_length, hyphens_to_length columns)
+    """
+    counts = np.zeros(256, dtype=np.int64)
+    length = 0
+    for b in url_bytes:
+        counts[b] += 1
+        # UTF-8 continuation bytes (10xxxxxx) don't start a new character
+        if b & 0xC0 != 0x80:
+            length += 1
+
+    out[length_cols[0]] = length
+    for k in range(count_cols.shape[0]):
+        out[count_cols[k]] = counts[count_bytes[k]]
+
+    if length > 0:
+        out[length_cols[1]] = counts[_DOT] / length
+        out[length_cols[2]] = counts[_HYPHEN] / length
+    else:
+        out[length_cols[1]] = 0
+        out[length_cols[2]] = 0
+
+
+def _extract_numeric_numpy(url_bytes, out):
+    """NumPy equivalent of _extract_numeric_loop, used when numba is not installed"""
+    counts = np.bincount(url_bytes, minlength=256)
+    length = int(np.count_nonzero((url_bytes & 0xC0) != 0x80))
+
+    out[_URL_LENGTH_COL] = length
+    out[_COUNT_COLS] = counts[_COUNT_BYTES]
+
+    if length > 0:
+        out[_DOTS_RATIO_COL] = counts[_DOT] / length
+        out[_HYPHENS_RATIO_COL] = counts[_HYPHEN] / length
+    else:
+        out[_DOTS_RATIO_COL] = 0
+        out[_HYPHENS_RATIO_COL] = 0
+
+
+# Byte -> slot in the batch histogram: counted characters first, then UTF-8
+# continuation bytes (to turn byte lengths into character lengths), then the rest
+_CONTINUATION_SLOT = len(_COUNT_BYTES)
+_NUM_SLOTS = _CONTINUATION_SLOT + 2
+_BYTE_SLOTS = np.full(256, _NUM_SLOTS - 1, dtype=np.int64)
+_BYTE_SLOTS[0x80:0xC0] = _CONTINUATION_SLOT
+_BYTE_SLOTS[_COUNT_BYTES] = np.arange(len(_COUNT_BYTES))
+_DOT_SLOT = int(_BYTE_SLOTS[_DOT])
+_HYPHEN_SLOT = int(_BYTE_SLOTS[_HYPHEN])
+
+
+def _extract_numeric_batch_numpy(buf, offsets, out):
+    """NumPy equivalent of extract_numeric_batch: one histogram of (URL, byte slot) pairs"""
+    byte_lengths = np.diff(offsets)
+    url_ids = np.repeat(np.arange(len(byte_lengths), dtype=np.int64), byte_lengths)
+    histogram = np.bincount(
+        url_ids * _NUM_SLOTS + _BYTE_SLOTS[buf], minlength=len(byte_lengths) * _NUM_SLOTS
+    ).reshape(len(byte_lengths), _NUM_SLOTS)
+    
+    lengths = byte_lengths - histogram[:, _CONTINUATION_SLOT]
+    out[:, _URL_LENGTH_COL] = lengths
+    out[:, _COUNT_COLS] = histogram[:, :_CONTINUATION_SLOT]
+    
+    safe_lengths = np.maximum(lengths, 1)
+    out[:, _DOTS_RATIO_COL] = histogram[:, _DOT_SLOT] / safe_lengths
+    out[:, _HYPHENS_RATIO_COL] = histogram[:, _HYPHEN_SLOT] / safe_lengths
+
+
+if NUMBA_AVAILABLE:
+    _extract_numeric_jit = njit(cache=True)(_extract_numeric_loop)
+    
+    @njit(parallel=True, cache=True)
+    def _extract_numeric_batch_jit(buf, offsets, out, count_cols, count_bytes, length_cols):
+        """Parallel loop of extract_numeric_batch; column arrays as in _extract_numeric_loop"""
+        for i in prange(out.shape[0]):
+            _extract_numeric_jit(buf[offsets[i]:offsets[i + 1]], out[i], count_cols, count_bytes, length_cols)
+    
+    def extract_numeric(url_bytes, out):
+        """
+        Write the NUMERIC_FEATURES of one URL into a feature row
+        
+        Args:
+            url_bytes: URL as a uint8 array (see url_to_bytes)
+            out: Row of length len(FEATURE_ORDER); only NUMERIC_FEATURES columns are written
+        """
+        _extract_numeric_jit(url_bytes, out, _COUNT_COLS, _COUNT_BYTES, _LENGTH_COLS)
+    
+    def extract_numeric_batch(buf, offsets, out):
+        """
+        Write the NUMERIC_FEATURES of many URLs into a feature matrix, in parallel
+        
+        Args:
+            buf, offsets: Packed URLs (see pack_urls)
+            out: Matrix of shape (len(offsets) - 1, len(FEATURE_ORDER))
+        """
+        _extract_numeric_batch_jit(buf, offsets, out, _COUNT_COLS, _COUNT_BYTES, _LENGTH_COLS)
+else:
+    extract_numeric = _extract_numeric_numpy
+    extract_numeric_batch = _extract_numeric_batch_numpy
+
@@ -5,30 +5,120 @@ Main detection logic combining ML and heuristic methods
 
 import pickle
 import os
+import sys
+import threading
+import warnings
 import numpy as np
-from .feature_extractor import FeatureExtractor
+from .feature_extractor import FeatureExtractor, FEATURE_ORDER
+
+# joblib ships with scikit-learn; fall back to plain pickle without it
+try:
+    import joblib
+    JOBLIB_AVAILABLE = True
+except ImportError:
+    JOBLIB_AVAILABLE = False
+
+DEFAULT_MODEL_PATH = os.path.join(os.path.dirname(__file__), 'models', 'phishing_model.pkl')
+
+# Loaded models shared by every PhishDetector in the process: absolute path ->
+# (modification time, model). A retrained file replaces its entry, so the old
+# model (and its memory mapping) is released once no detector holds it.
+_MODEL_CACHE = {}
+_MODEL_CACHE_LOCK = threading.Lock()
+
+
+def _read_model(path):
+    """Read a model file saved with joblib.dump or pickle.dump"""
+    if JOBLIB_AVAILABLE:
+        try:
+            # Memory-map the stored ndarrays instead of reading them into heap copies.
+            # Compressed files (train_kaggle.py) can't be mapped and are read normally.
+            with warnings.catch_warnings():
+                warnings.filterwarnings('ignore', message='mmap_mode .* not compatible with compressed')
+                return joblib.load(path, mmap_mode='r')
+        except Exception:
+            pass
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+def _load_cached_model(model_path):
+    """Return the model stored at model_path, reading the file at most once"""
+    path = os.path.abspath(model_path)
+    mtime = os.path.getmtime(path)
+    with _MODEL_CACHE_LOCK:
+        cached = _MODEL_CACHE.get(path)
+        if cached is None or cached[0] != mtime:
+            cached = _MODEL_CACHE[path] = (mtime, _read_model(path))
+        return cached[1]
 
 
 class PhishDetector:
     """Main phishing detection class"""
     
-    def __init__(self, model_path=None):
-        self.feature_extractor = FeatureExtractor()
+    # Heuristic scores at or above ML_SKIP_ABOVE are decisive on their own, so
+    # the ML model is not consulted for them. Low scores are never decisive:
+    # many phishing URLs raise no heuristic flag at all, online or offline.
+    ML_SKIP_ABOVE = 0.9
+    
+    def __init__(self, model_path=None, network=True):
+        """
+        Args:
+            model_path: ML model file (defaults to the bundled model)
+            network: Perform WHOIS/SSL/DNS lookups during feature extraction
+        """
+        self.feature_extractor = FeatureExtractor(network=network)
         self.model = None
-        self.model_path = model_path or os.path.join(
-            os.path.dirname(__file__), 'models', 'phishing_model.pkl'
-        )
+        self.model_path = model_path or DEFAULT_MODEL_PATH
+        # How often the model ran vs. was skipped, for tuning ML_SKIP_ABOVE
+        self.ml_evaluated = 0
+        self.ml_skipped = 0
+        # detect() may run on many threads sharing one detector (CLI --file)
+        self._counter_lock = threading.Lock()
         self._load_model()
     
+    @classmethod
+    def preload(cls, model_path=None):
+        """
+        Load a model into the in-process cache ahead of time
+        
+        Detectors created afterwards for the same path reuse it instead of
+        loading the file again.
+        
+        Args:
+            model_path: Model file to load (defaults to the bundled model)
+            
+        Returns:
+            The loaded model
+        """
+        return _load_cached_model(model_path or DEFAULT_MODEL_PATH)
+    
+    @property
+    def ml_skip_rate(self):
+        """Fraction of model-eligible detections decided by heuristics alone"""
+        with self._counter_lock:
+            evaluated, skipped = self.ml_evaluated, self.ml_skipped
+        total = evaluated + skipped
+        return skipped / total if total else 0.0
+    
+    def _count_ml(self, evaluated, skipped):
+        """Add to the ML evaluated/skipped counters"""
+        with self._counter_lock:
+            self.ml_evaluated += evaluated
+            self.ml_skipped += skipped
+    
+    def _heuristic_is_decisive(self, heuristic_score):
+        """True when the heuristic score alone settles the verdict"""
+        return heuristic_score >= self.ML_SKIP_ABOVE
+    
     def _load_model(self):
         """Load pre-trained ML model"""
         try:
             if os.path.exists(self.model_path):
-                with open(self.model_path, 'rb') as f:
-                    self.model = pickle.load(f)
+                self.model = _load_cached_model(self.model_path)
         except Exception as e:
-            print(f"Warning: Could not load ML model: {e}")
-            print("Using heuristic-only detection")
+            print(f"Warning: Could not load ML model: {e}", file=sys.stderr)
+            print("Using heuristic-only detection", file=sys.stderr)
     
     def detect(self, url):
         """
@@ -46,19 +136,72 @@ class PhishDetector:
         # Heuristic analysis
         heuristic_score = self._heuristic_analysis(features, url)
         
-        # ML prediction (if model available)
+        # ML prediction (if model available and the heuristics are not decisive)
         ml_score = None
         ml_confidence = None
-        if self.model:
+        if self.model and self._heuristic_is_decisive(heuristic_score):
+            self._count_ml(0, 1)
+        elif self.model:
+            self._count_ml(1, 0)
             try:
                 feature_vector = self._features_to_vector(features)
-                prediction = self.model.predict([feature_vector])[0]
-                probabilities = self.model.predict_proba([feature_vector])[0]
-                ml_score = int(prediction)
-                ml_confidence = float(max(probabilities))
+                # One forest traversal: predict() is just argmax over predict_proba()
+                proba = self.model.predict_proba(feature_vector.reshape(1, -1))[0]
+                ml_score = int(self.model.classes_[proba.argmax()])
+                ml_confidence = float(proba.max())
+            except Exception as e:
+                print(f"ML prediction error: {e}", file=sys.stderr)
+        
+        return self._build_result(url, features, heuristic_score, ml_score, ml_confidence)
+    
+    def detect_batch(self, urls):
+        """
+        Detect phishing for many URLs at once
+        
+        Features are stacked into one (N, F) matrix so the ML model is
+        called a single time for the whole batch.
+        
+        Args:
+            urls: URLs to check
+            
+        Returns:
+            list: Detection result dicts, in the same order as urls
+        """
+        urls = list(urls)
+        features_list = [self.feature_extractor.extract_features(url) for url in urls]
+        
+        # Heuristic analysis for all URLs in one matrix-vector product
+        heuristic_scores = self._heuristic_analysis_batch(features_list)
+        
+        # ML prediction (if model available) for the URLs heuristics don't decide
+        ml_scores = [None] * len(urls)
+        ml_confidences = [None] * len(urls)
+        if self.model:
+            undecided = np.flatnonzero(heuristic_scores < self.ML_SKIP_ABOVE)
+            self._count_ml(len(undecided), len(urls) - len(undecided))
+        else:
+            undecided = []
+        if len(undecided):
+            try:
+                X = np.empty((len(undecided), len(FEATURE_ORDER)), dtype=np.float32)
+                for row, i in enumerate(undecided):
+                    self._fill_vector(features_list[i], X[row])
+                proba = self.model.predict_proba(X)
+                classes = self.model.classes_[proba.argmax(axis=1)]
+                for i, ml_class, ml_confidence in zip(undecided, classes, proba.max(axis=1)):
+                    ml_scores[i] = int(ml_class)
+                    ml_confidences[i] = float(ml_confidence)
             except Exception as e:
-                print(f"ML prediction error: {e}")
+                print(f"ML prediction error: {e}", file=sys.stderr)
         
+        return [
+            self._build_result(url, features, float(heuristic_score), ml_score, ml_confidence)
+            for url, features, heuristic_score, ml_score, ml_confidence
+            in zip(urls, features_list, heuristic_scores, ml_scores, ml_confidences)
+        ]
+    
+    def _build_result(self, url, features, heuristic_score, ml_score, ml_confidence):
+        """Combine the scores for one URL into a detection result dict"""
         # Combine results
         final_score = self._combine_scores(heuristic_score, ml_score, ml_confidence)
         
@@ -80,94 +223,56 @@ class PhishDetector:
             'features': features
         }
     
-    def _heuristic_analysis(self, features, url):
-        """Heuristic-based phishing detection"""
-        score = 0.0
-        max_score = 0.0
-        
-        # URL length (suspicious if very long)
-        if features['url_length'] > 75:
-            score += 0.1
-        max_score += 0.1
-        
-        # Suspicious TLD
-        if features['suspicious_tld']:
-            score += 0.15
-        max_score += 0.15
-        
-        # IP address in domain
-        if features['has_ip']:
-            score += 0.2
-        max_score += 0.2
-        
-        # Shortened URL
-        if features['is_shortened']:
-            score += 0.1
-        max_score += 0.1
-        
-        # Suspicious keywords
-        if features['suspicious_keywords'] > 2:
-            score += 0.15
-        max_score += 0.15
-        
-        # Domain in subdomain (typosquatting)
-        if features['domain_in_subdomain']:
-            score += 0.15
-        max_score += 0.15
-        
-        # No HTTPS
-        if not features['has_https']:
-            score += 0.1
-        max_score += 0.1
-        
-        # Invalid SSL
-        if features['has_https'] and not features['has_valid_ssl']:
-            score += 0.15
-        max_score += 0.15
-        
-        # New domain (age < 30 days)
-        if features['domain_age'] > 0 and features['domain_age'] < 30:
-            score += 0.1
-        max_score += 0.1
-        
-        # High number of special characters
+    # Weight of each heuristic rule, in the order returned by _heuristic_flags
+    _HEURISTIC_WEIGHTS = np.array(
+        [0.1, 0.15, 0.2, 0.1, 0.15, 0.15, 0.1, 0.15, 0.1, 0.1, 0.1], dtype=np.float64
+    )
+    _HEURISTIC_MAX = _HEURISTIC_WEIGHTS.sum()
+    
+    def _heuristic_flags(self, features):
+        """Evaluate each heuristic rule for one URL (truthy = rule triggered)"""
         special_chars = (features['num_percent'] + features['num_at_symbols'] + 
                         features['num_hashes'])
-        if special_chars > 3:
-            score += 0.1
-        max_score += 0.1
-        
-        # Typosquatting patterns
-        if features['is_typosquatting']:
-            score += 0.1
-        max_score += 0.1
-        
-        # Normalize score
-        if max_score > 0:
-            normalized_score = min(score / max_score, 1.0)
-        else:
-            normalized_score = 0.0
-        
-        return normalized_score
+        return (
+            features['url_length'] > 75,                              # Very long URL
+            features['suspicious_tld'],                               # Suspicious TLD
+            features['has_ip'],                                       # IP address in domain
+            features['is_shortened'],                                 # Shortened URL
+            features['suspicious_keywords'] > 2,                      # Suspicious keywords
+            features['domain_in_subdomain'],                          # Domain in subdomain
+            not features['has_https'],                                # No HTTPS
+            self._ssl_invalid(features),                              # Invalid SSL
+            0 < features['domain_age'] < 30,                          # New domain (< 30 days)
+            special_chars > 3,                                        # Many special characters
+            features['is_typosquatting'],                             # Typosquatted brand name
+        )
+    
+    def _ssl_invalid(self, features):
+        """HTTPS with a failed certificate check (never, when lookups are disabled)"""
+        return (self.feature_extractor.network and features['has_https']
+                and not features['has_valid_ssl'])
+    
+    def _heuristic_analysis(self, features, url):
+        """Heuristic-based phishing detection, normalized to 0.0-1.0"""
+        flags = np.array(self._heuristic_flags(features), dtype=np.float64)
+        return float(flags @ self._HEURISTIC_WEIGHTS / self._HEURISTIC_MAX)
+    
+    def _heuristic_analysis_batch(self, features_list):
+        """Heuristic scores for many URLs as a single (N, rules) @ weights product"""
+        flags = np.array([self._heuristic_flags(f) for f in features_list], dtype=np.float64)
+        flags = flags.reshape(len(features_list), len(self._HEURISTIC_WEIGHTS))
+        return flags @ self._HEURISTIC_WEIGHTS / self._HEURISTIC_MAX
     
     def _features_to_vector(self, features):
         """Convert features dict to numpy array for ML model"""
-        feature_order = [
-            'url_length', 'hostname_length', 'path_length', 'query_length',
-            'num_dots', 'num_hyphens', 'num_underscores', 'num_slashes',
-            'num_question_marks', 'num_equals', 'num_ampersands', 'num_percent',
-            'num_at_symbols', 'has_https', 'has_http', 'domain_in_subdomain',
-            'has_ip', 'is_shortened', 'suspicious_tld', 'suspicious_keywords',
-            'has_port', 'num_params', 'has_redirect', 'domain_age',
-            'has_valid_ssl', 'dns_record_count', 'is_typosquatting',
-            'dots_to_length', 'hyphens_to_length'
-        ]
-        
-        vector = []
-        for feature in feature_order:
-            vector.append(features.get(feature, 0))
-        
-        return np.array(vector)
+        vector = np.empty(len(FEATURE_ORDER), dtype=np.float32)
+        self._fill_vector(features, vector)
+        return vector
+    
+    def _fill_vector(self, features, out):
+        """Write features into a preallocated row (e.g. one row of a batch matrix)"""
+        for i, feature in enumerate(FEATURE_ORDER):
+            out[i] = features.get(feature, 0)
     
     def _combine_scores(self, heuristic_score, ml_score, ml_confidence):
         """Combine heuristic and ML scores"""
@@ -222,7 +327,7 @@ class PhishDetector:
         if not features['has_https']:
             reasons.append("Does not use HTTPS")
         
-        if features['has_https'] and not features['has_valid_ssl']:
+        if self._ssl_invalid(features):
             reasons.append("HTTPS certificate is invalid")
         
         if features['domain_age'] > 0 and features['domain_age'] < 30:
@@ -232,7 +337,7 @@ class PhishDetector:
             reasons.append("URL is unusually long")
         
         if features['is_typosquatting']:
-            reasons.append("Shows typosquatting patterns")
+            reasons.append("Domain name is a near-miss spelling of a well-known brand (possible typosquatting)")
         
         if not reasons:
             reasons.append("No obvious phishing indicators detected")
@@ -4,11 +4,15 @@ Extracts various features from URLs to detect phishing attempts
 """
 
 import re
+import sys
+import functools
 import urllib.parse
 import socket
+import time
 from datetime import datetime
 from urllib.parse import urlparse, parse_qs
 import ssl
+import numpy as np
 
 # Optional imports - handle gracefully if not installed
 try:
@@ -16,41 +20,206 @@ try:
     WHOIS_AVAILABLE = True
 except ImportError:
     WHOIS_AVAILABLE = False
-    print("Warning: python-whois not installed. Domain age checking will be disabled.")
-    print("Install with: pip install python-whois")
+    print("Warning: python-whois not installed. Domain age checking will be disabled.", file=sys.stderr)
+    print("Install with: pip install python-whois", file=sys.stderr)
 
 try:
     import requests
     REQUESTS_AVAILABLE = True
 except ImportError:
     REQUESTS_AVAILABLE = False
-    print("Warning: requests not installed. Some features may be limited.")
+    print("Warning: requests not installed. Some features may be limited.", file=sys.stderr)
 
 try:
     import tldextract
     TL_EXTRACT_AVAILABLE = True
+    # Bundled public-suffix snapshot only; never fetch the list over the network
+    _tld_extract = tldextract.TLDExtract(suffix_list_urls=())
 except ImportError:
     TL_EXTRACT_AVAILABLE = False
-    print("Warning: tldextract not installed. Some domain features may be limited.")
+    print("Warning: tldextract not installed. Some domain features may be limited.", file=sys.stderr)
+
+# Optional accelerator - falls back to a precompiled regex with identical results
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
+# Optional accelerator - falls back to a pure-Python edit distance
+try:
+    from rapidfuzz.distance import OSA
+    RAPIDFUZZ_AVAILABLE = True
+except ImportError:
+    RAPIDFUZZ_AVAILABLE = False
+
+
+# Order of the features in the vector fed to the ML model
+FEATURE_ORDER = (
+    'url_length', 'hostname_length', 'path_length', 'query_length',
+    'num_dots', 'num_hyphens', 'num_underscores', 'num_slashes',
+    'num_question_marks', 'num_equals', 'num_ampersands', 'num_percent',
+    'num_at_symbols', 'has_https', 'has_http', 'domain_in_subdomain',
+    'has_ip', 'is_shortened', 'suspicious_tld', 'suspicious_keywords',
+    'has_port', 'num_params', 'has_redirect', 'domain_age',
+    'has_valid_ssl', 'dns_record_count', 'is_typosquatting',
+    'dots_to_length', 'hyphens_to_length'
+)
+FEATURE_INDEX = {name: i for i, name in enumerate(FEATURE_ORDER)}
+
+# Character-count features and the character each one counts
+# (num_dots and num_hyphens first: the ratio features read them by position)
+COUNTED_CHARS = (
+    ('num_dots', '.'), ('num_hyphens', '-'), ('num_underscores', '_'),
+    ('num_slashes', '/'), ('num_question_marks', '?'), ('num_equals', '='),
+    ('num_ampersands', '&'), ('num_percent', '%'), ('num_at_symbols', '@'),
+    ('num_exclamation', '!'), ('num_spaces', ' '), ('num_tildes', '~'),
+    ('num_commas', ','), ('num_plus', '+'), ('num_asterisks', '*'),
+    ('num_hashes', '#'), ('num_dollar', '$'), ('num_colons', ':')
+)
+# (column in FEATURE_ORDER or None, name, character, code) for each counted character
+_COUNTED_TARGETS = tuple(
+    (FEATURE_INDEX.get(name), name, ch, ord(ch)) for name, ch in COUNTED_CHARS
+)
+_MODEL_COUNTED_TARGETS = tuple(t for t in _COUNTED_TARGETS if t[0] is not None)
+
+# Above this length one byte-histogram pass beats a str.count scan per character
+_HISTOGRAM_MIN_LENGTH = 128
+
+
+def _osa_distance(a, b):
+    """Optimal string alignment distance (Levenshtein plus adjacent transpositions)"""
+    before_prev = None
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                cur[j] = min(cur[j], before_prev[j - 2] + 1)
+        before_prev, prev = prev, cur
+    return prev[-1]
+
+
+def _get_domain_age(domain):
+    """Get domain age in days (0 if can't determine)"""
+    if not WHOIS_AVAILABLE:
+        return 0
+    
+    try:
+        w = whois.whois(domain)
+        if w.creation_date:
+            if isinstance(w.creation_date, list):
+                creation_date = w.creation_date[0]
+            else:
+                creation_date = w.creation_date
+            
+            if creation_date:
+                age = (datetime.now() - creation_date).days
+                return age if age > 0 else 0
+    except:
+        pass
+    return 0
+
+
+def _check_ssl_certificate(domain):
+    """Check if domain has valid SSL certificate"""
+    try:
+        context = ssl.create_default_context()
+        with socket.create_connection((domain, 443), timeout=3) as sock:
+            with context.wrap_socket(sock, server_hostname=domain) as ssock:
+                return 1
+    except:
+        return 0
+
+
+def _get_dns_record_count(domain):
+    """Get count of DNS records (simplified)"""
+    try:
+        socket.gethostbyname(domain)
+        return 1
+    except:
+        return 0
+
+
+# Seconds a domain's network lookups are reused before they are repeated
+NETWORK_CACHE_TTL = 600
+
+
+def _domain_network_features(domain):
+    """
+    Domain age, SSL validity and DNS record count for a domain
+    
+    These depend only on the domain, so results are memoized: a corpus with
+    many URLs per domain costs one set of network round-trips per domain.
+    Entries last at most NETWORK_CACHE_TTL seconds, so a timed-out lookup
+    (cached as 0) or an aging domain_age does not stick for the life of a
+    long-running process.
+    
+    Args:
+        domain: Domain (netloc) to look up
+        
+    Returns:
+        tuple: (domain_age, has_valid_ssl, dns_record_count)
+    """
+    return _cached_domain_network_features(domain, int(time.monotonic() // NETWORK_CACHE_TTL))
+
+
+@functools.lru_cache(maxsize=100_000)
+def _cached_domain_network_features(domain, period):
+    """_domain_network_features memoized per TTL period; older periods age out of the LRU"""
+    return (_get_domain_age(domain), _check_ssl_certificate(domain),
+            _get_dns_record_count(domain))
 
 
 class FeatureExtractor:
     """Extract features from URLs for phishing detection"""
     
-    def __init__(self):
+    def __init__(self, network=True):
+        """
+        Args:
+            network: Look up domain age (WHOIS), SSL certificate and DNS for each
+                     URL. These are blocking network round-trips; when False the
+                     corresponding features are reported as 0.
+        """
+        self.network = network
+        
         self.suspicious_keywords = [
             'secure', 'verify', 'account', 'update', 'confirm', 'login',
-            'signin', 'banking', 'ebayisapi', 'paypal', 'webscr', 'secure',
-            'account', 'update', 'confirm', 'suspend', 'restrict', 'limited',
-            'unusual', 'activity', 'verify', 'validate', 'urgent', 'immediate'
+            'signin', 'banking', 'ebayisapi', 'paypal', 'webscr', 'suspend',
+            'restrict', 'limited', 'unusual', 'activity', 'validate', 'urgent',
+            'immediate'
         ]
         
+        # Match every keyword in one pass over the URL instead of one scan each
+        keywords = self.suspicious_keywords
+        if AHOCORASICK_AVAILABLE:
+            self._kw_automaton = ahocorasick.Automaton()
+            for keyword in keywords:
+                self._kw_automaton.add_word(keyword, keyword)
+            self._kw_automaton.make_automaton()
+        else:
+            self._kw_automaton = None
+        # Zero-width lookahead so overlapping keywords are all reported
+        self._kw_re = re.compile('(?=(' + '|'.join(map(re.escape, keywords)) + '))')
+        
         self.suspicious_tlds = ['.tk', '.ml', '.ga', '.cf', '.gq', '.xyz', '.top']
         
         self.shortening_services = [
             'bit.ly', 'tinyurl.com', 'goo.gl', 'ow.ly', 't.co', 'is.gd',
             'buff.ly', 'adf.ly', 'shorte.st', 'bc.vc', 'v.gd', 'vzturl.com'
         ]
+        
+        # Lookup forms: str.endswith takes a tuple, shorteners match by hash
+        self._suspicious_tlds = tuple(self.suspicious_tlds)
+        self._shortener_set = frozenset(self.shortening_services)
+        
+        # Brands commonly imitated by typosquatted domains
+        self.brand_names = [
+            'google', 'microsoft', 'apple', 'amazon', 'facebook', 'paypal',
+            'ebay', 'netflix', 'chase', 'wellsfargo'
+        ]
     
     def extract_features(self, url):
         """
@@ -62,157 +231,184 @@ class FeatureExtractor:
         Returns:
             dict: Dictionary of extracted features
         """
-        features = {}
+        values = [0] * len(FEATURE_ORDER)
+        extra = {}
+        self._extract(url, values, True, extra)
+        features = dict(zip(FEATURE_ORDER, values))
+        features.update(extra)
+        return features
+    
+    def extract_into(self, url, out, numeric=True):
+        """
+        Write the ML model features of a URL into a preallocated row
+        
+        Skips building the features dict, so it is the cheaper path when only
+        the model vector is needed (e.g. training).
+        
+        Args:
+            url: The URL to analyze
+            out: Row of len(FEATURE_ORDER) (e.g. one row of a numpy matrix),
+                 filled in FEATURE_ORDER
+            numeric: Also write the length, character-count and ratio columns.
+                     Training passes False and fills those with the compiled
+                     kernel in phishsense._fast instead.
+        """
+        self._extract(url, out, numeric, None)
+    
+    def _extract(self, url, out, numeric, extra):
+        """Write model features into out; other features into extra unless it is None"""
+        i = FEATURE_INDEX
+        
+        # Parse and lowercase once; every feature below reuses these
+        parsed = urlparse(url)
+        url_lower = url.lower()
+        domain = parsed.netloc
+        domain_lower = domain.lower()
+        # Bare host (no userinfo or port) for the checks that work on its labels
+        host_lower = domain_lower.rpartition('@')[2]
+        if not host_lower.startswith('['):
+            host_lower = host_lower.partition(':')[0]
         
         # Basic URL features
-        features['url_length'] = len(url)
-        features['hostname_length'] = len(urlparse(url).netloc)
-        features['path_length'] = len(urlparse(url).path)
-        features['query_length'] = len(urlparse(url).query)
-        
-        # Count features
-        features['num_dots'] = url.count('.')
-        features['num_hyphens'] = url.count('-')
-        features['num_underscores'] = url.count('_')
-        features['num_slashes'] = url.count('/')
-        features['num_question_marks'] = url.count('?')
-        features['num_equals'] = url.count('=')
-        features['num_ampersands'] = url.count('&')
-        features['num_percent'] = url.count('%')
-        features['num_at_symbols'] = url.count('@')
-        features['num_exclamation'] = url.count('!')
-        features['num_spaces'] = url.count(' ')
-        features['num_tildes'] = url.count('~')
-        features['num_commas'] = url.count(',')
-        features['num_plus'] = url.count('+')
-        features['num_asterisks'] = url.count('*')
-        features['num_hashes'] = url.count('#')
-        features['num_dollar'] = url.count('$')
-        features['num_colons'] = url.count(':')
+        out[i['hostname_length']] = len(domain)
+        out[i['path_length']] = len(parsed.path)
+        out[i['query_length']] = len(parsed.query)
+        
+        # Count and ratio features
+        if numeric:
+            url_length = len(url)
+            targets = _COUNTED_TARGETS if extra is not None else _MODEL_COUNTED_TARGETS
+            if url_length > _HISTOGRAM_MIN_LENGTH:
+                # All counted characters are ASCII, so UTF-8 byte counts are exact
+                histogram = np.bincount(
+                    np.frombuffer(url.encode('utf-8', 'surrogatepass'), dtype=np.uint8),
+                    minlength=128
+                ).tolist()
+                counts = [histogram[code] for _, _, _, code in targets]
+            else:
+                counts = [url.count(ch) for _, _, ch, _ in targets]
+            for (col, name, _, _), count in zip(targets, counts):
+                if col is None:
+                    extra[name] = count
+                else:
+                    out[col] = count
+            
+            num_dots = counts[0]
+            num_hyphens = counts[1]
+            out[i['url_length']] = url_length
+            if url_length > 0:
+                out[i['dots_to_length']] = num_dots / url_length
+                out[i['hyphens_to_length']] = num_hyphens / url_length
+            else:
+                out[i['dots_to_length']] = 0
+                out[i['hyphens_to_length']] = 0
         
         # Protocol features
-        features['has_https'] = 1 if urlparse(url).scheme == 'https' else 0
-        features['has_http'] = 1 if urlparse(url).scheme == 'http' else 0
-        features['has_ftp'] = 1 if urlparse(url).scheme == 'ftp' else 0
+        scheme = parsed.scheme
+        out[i['has_https']] = 1 if scheme == 'https' else 0
+        out[i['has_http']] = 1 if scheme == 'http' else 0
+        if extra is not None:
+            extra['has_ftp'] = 1 if scheme == 'ftp' else 0
         
         # Domain features
-        parsed = urlparse(url)
-        domain = parsed.netloc
-        features['domain_in_subdomain'] = self._check_domain_in_subdomain(domain)
-        features['has_ip'] = 1 if self._has_ip_address(domain) else 0
-        features['is_shortened'] = 1 if self._is_shortened_url(domain) else 0
-        features['suspicious_tld'] = 1 if self._has_suspicious_tld(domain) else 0
+        out[i['domain_in_subdomain']] = self._check_domain_in_subdomain(domain_lower)
+        out[i['has_ip']] = 1 if self._has_ip_address(domain) else 0
+        out[i['is_shortened']] = 1 if self._is_shortened_url(host_lower) else 0
+        out[i['suspicious_tld']] = 1 if self._has_suspicious_tld(domain_lower) else 0
         
         # Path features
-        path = parsed.path.lower()
-        features['suspicious_keywords'] = self._count_suspicious_keywords(url.lower())
-        features['has_port'] = 1 if ':' in domain and not domain.startswith('[') else 0
+        out[i['suspicious_keywords']] = self._count_suspicious_keywords(url_lower)
+        out[i['has_port']] = 1 if ':' in domain and not domain.startswith('[') else 0
         
         # Query features
         query = parsed.query
-        features['num_params'] = len(parse_qs(query))
-        features['has_redirect'] = 1 if 'redirect' in query.lower() or 'url=' in query.lower() else 0
-        
-        # Advanced features
-        features['domain_age'] = self._get_domain_age(domain)
-        features['has_valid_ssl'] = self._check_ssl_certificate(domain)
-        features['dns_record_count'] = self._get_dns_record_count(domain)
-        features['is_typosquatting'] = self._check_typosquatting(domain)
-        
-        # Ratio features
-        if features['url_length'] > 0:
-            features['dots_to_length'] = features['num_dots'] / features['url_length']
-            features['hyphens_to_length'] = features['num_hyphens'] / features['url_length']
-        else:
-            features['dots_to_length'] = 0
-            features['hyphens_to_length'] = 0
+        query_lower = query.lower()
+        out[i['num_params']] = len(parse_qs(query))
+        out[i['has_redirect']] = 1 if 'redirect' in query_lower or 'url=' in query_lower else 0
         
-        return features
+        # Advanced features (network lookups)
+        if self.network:
+            (out[i['domain_age']], out[i['has_valid_ssl']],
+             out[i['dns_record_count']]) = _domain_network_features(domain)
+        else:
+            out[i['domain_age']] = 0
+            out[i['has_valid_ssl']] = 0
+            out[i['dns_record_count']] = 0
+        out[i['is_typosquatting']] = self._check_typosquatting(host_lower)
     
-    def _check_domain_in_subdomain(self, domain):
-        """Check if legitimate domain appears in subdomain"""
+    def _check_domain_in_subdomain(self, domain_lower):
+        """Check if legitimate domain appears in subdomain (expects lowercased domain)"""
         common_domains = ['google', 'microsoft', 'apple', 'amazon', 'facebook', 
                          'paypal', 'ebay', 'bank', 'wellsfargo', 'chase']
-        domain_lower = domain.lower()
         for common in common_domains:
             if common in domain_lower and domain_lower != common:
                 return 1
         return 0
     
     def _has_ip_address(self, domain):
-        """Check if domain is an IP address"""
+        """Check if domain is an IP address (IPv4 in any inet_aton form, or IPv6)"""
+        host = domain.rsplit('@', 1)[-1]
+        if host.startswith('['):
+            # Bracketed IPv6 literal, optionally followed by :port
+            end = host.find(']')
+            if end < 0:
+                return False
+            try:
+                socket.inet_pton(socket.AF_INET6, host[1:end])
+                return True
+            except (OSError, ValueError):
+                return False
+        
+        # Only digit-led hosts can be IPv4; skip the raise/catch for ordinary hostnames
+        host = host.split(':', 1)[0]
+        if not host[:1].isdigit():
+            return False
         try:
-            socket.inet_aton(domain.replace('[', '').replace(']', ''))
+            # inet_aton (unlike inet_pton) also accepts hex/octal/short forms
+            # such as 0x7f000001 that phishing URLs use to disguise an IP
+            socket.inet_aton(host)
             return True
-        except:
+        except (OSError, ValueError):
             return False
     
-    def _is_shortened_url(self, domain):
-        """Check if URL uses shortening service"""
-        for service in self.shortening_services:
-            if service in domain.lower():
-                return True
-        return False
+    def _is_shortened_url(self, host_lower):
+        """Check if URL uses shortening service (expects lowercased bare host)"""
+        registered = '.'.join(host_lower.rsplit('.', 2)[-2:])
+        return registered in self._shortener_set
     
-    def _has_suspicious_tld(self, domain):
-        """Check for suspicious TLDs"""
-        for tld in self.suspicious_tlds:
-            if domain.endswith(tld):
-                return True
-        return False
+    def _has_suspicious_tld(self, domain_lower):
+        """Check for suspicious TLDs (expects lowercased domain)"""
+        return domain_lower.endswith(self._suspicious_tlds)
     
-    def _count_suspicious_keywords(self, url):
-        """Count suspicious keywords in URL"""
-        count = 0
-        for keyword in self.suspicious_keywords:
-            if keyword in url:
-                count += 1
-        return count
-    
-    def _get_domain_age(self, domain):
-        """Get domain age in days (0 if can't determine)"""
-        if not WHOIS_AVAILABLE:
-            return 0
-        
-        try:
-            w = whois.whois(domain)
-            if w.creation_date:
-                if isinstance(w.creation_date, list):
-                    creation_date = w.creation_date[0]
-                else:
-                    creation_date = w.creation_date
-                
-                if creation_date:
-                    age = (datetime.now() - creation_date).days
-                    return age if age > 0 else 0
-        except:
-            pass
-        return 0
+    def _count_suspicious_keywords(self, url_lower):
+        """Count distinct suspicious keywords in URL (expects lowercased URL)"""
+        if self._kw_automaton is not None:
+            return len({keyword for _, keyword in self._kw_automaton.iter(url_lower)})
+        return len(set(self._kw_re.findall(url_lower)))
     
-    def _check_ssl_certificate(self, domain):
-        """Check if domain has valid SSL certificate"""
-        try:
-            context = ssl.create_default_context()
-            with socket.create_connection((domain, 443), timeout=3) as sock:
-                with context.wrap_socket(sock, server_hostname=domain) as ssock:
-                    return 1
-        except:
-            return 0
+    def _registered_label(self, host_lower):
+        """Registrable label of a host, e.g. 'paypal' for 'www.paypal.co.uk'"""
+        if host_lower.startswith('['):
+            return ''
+        if TL_EXTRACT_AVAILABLE:
+            return _tld_extract(host_lower).domain
+        labels = host_lower.split('.')
+        return labels[-2] if len(labels) >= 2 else labels[0]
     
-    def _get_dns_record_count(self, domain):
-        """Get count of DNS records (simplified)"""
-        try:
-            socket.gethostbyname(domain)
-            return 1
-        except:
+    def _check_typosquatting(self, host_lower):
+        """Check if the host is a near-miss spelling of a well-known brand (expects lowercased bare host)"""
+        label = self._registered_label(host_lower)
+        if not label:
             return 0
-    
-    def _check_typosquatting(self, domain):
-        """Check for typosquatting patterns"""
-        # Simple check for character repetition or suspicious patterns
-        if re.search(r'(.)\1{3,}', domain):
-            return 1
-        if len(re.findall(r'[0-9]', domain)) > 3:
-            return 1
+        for brand in self.brand_names:
+            # Two edits on a short brand name matches too many unrelated words
+            max_distance = 2 if len(brand) >= 6 else 1
+            if abs(len(label) - len(brand)) > max_distance:
+                continue
+            if RAPIDFUZZ_AVAILABLE:
+                distance = OSA.distance(label, brand, score_cutoff=max_distance)
+            else:
+                distance = _osa_distance(label, brand)
+            if 0 < distance <= max_distance:
+                return 1
         return 0
-
@@ -5,13 +5,31 @@ Trains a machine learning model on phishing and legitimate URLs
 
 import pandas as pd
 import numpy as np
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.model_selection import train_test_split
+from sklearn.ensemble import HistGradientBoostingClassifier
 from sklearn.metrics import accuracy_score, classification_report, confusion_matrix
-import pickle
+import joblib
+import io
 import os
 import zipfile
-from .feature_extractor import FeatureExtractor
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from .feature_extractor import FeatureExtractor, FEATURE_ORDER
+from ._fast import extract_numeric, url_to_bytes
+
+# Optional - progress bar for feature extraction; periodic progress lines without it
+try:
+    from tqdm import tqdm
+    TQDM_AVAILABLE = True
+except ImportError:
+    TQDM_AVAILABLE = False
+
+# Threads used to overlap WHOIS/SSL/DNS lookups when network features are on
+NETWORK_WORKERS = 64
+
+
+def _stripped_lines(lines):
+    """Yield non-empty, stripped lines"""
+    return (line for line in map(str.strip, lines) if line)
 
 
 def load_from_file(file_path):
@@ -38,16 +56,18 @@ def load_from_file(file_path):
                 # Read from first text file found (or all if multiple)
                 for text_file in text_files:
                     try:
-                        with zip_ref.open(text_file) as f:
-                            # Try different encodings
-                            for encoding in ['utf-8', 'latin-1', 'iso-8859-1']:
-                                try:
-                                    content = f.read().decode(encoding)
-                                    lines = content.split('\n')
-                                    urls.extend([line.strip() for line in lines if line.strip()])
-                                    break
-                                except UnicodeDecodeError:
-                                    continue
+                        # Try different encodings, decoding the member line by
+                        # line instead of holding the whole file in memory
+                        for encoding in ['utf-8', 'latin-1', 'iso-8859-1']:
+                            start = len(urls)
+                            try:
+                                with zip_ref.open(text_file) as raw:
+                                    urls.extend(_stripped_lines(io.TextIOWrapper(raw, encoding=encoding)))
+                                break
+                            except UnicodeDecodeError:
+                                # Drop lines read before the bad byte and retry
+                                del urls[start:]
+                                continue
                     except Exception as e:
                         print(f"Warning: Could not read {text_file} from ZIP: {e}")
                         continue
@@ -61,7 +81,7 @@ def load_from_file(file_path):
             for encoding in ['utf-8', 'latin-1', 'iso-8859-1']: 
                 try:
                     with open(file_path, 'r', encoding=encoding) as f:
-                        urls = [line.strip() for line in f if line.strip()]
+                        urls = list(_stripped_lines(f))
                         break
                 except UnicodeDecodeError:
                     continue
@@ -85,52 +105,83 @@ def load_dataset(phishing_file, legitimate_file):
     return phishing_urls, legitimate_urls
 
 
+def _fill_row(feature_extractor, url, row):
+    """Write the model features of one URL into row; False if extraction fails"""
+    try:
+        # Length/count/ratio columns from the compiled kernel, the rest parsed
+        extract_numeric(url_to_bytes(url), row)
+        feature_extractor.extract_into(url, row, numeric=False)
+        return True
+    except Exception as e:
+        print(f"Error processing {url}: {e}")
+        return False
+
+
 def prepare_features(urls, labels, feature_extractor):
-    """Extract features from URLs"""
-    features_list = []
-    labels_list = []
+    """Extract features from URLs into a preallocated (N, F) float32 matrix"""
+    X = np.empty((len(urls), len(FEATURE_ORDER)), dtype=np.float32)
+    y = np.asarray(labels, dtype=np.int8)
+    ok = np.zeros(len(urls), dtype=bool)
     
     print("Extracting features...")
-    for i, url in enumerate(urls):
-        if i % 100 == 0:
-            print(f"Processed {i}/{len(urls)} URLs...")
-        
-        try:
-            features = feature_extractor.extract_features(url)
-            feature_vector = feature_extractor_to_vector(features)
-            features_list.append(feature_vector)
-            labels_list.append(labels[i])
-        except Exception as e:
-            print(f"Error processing {url}: {e}")
-            continue
+    # Each call writes straight into its own row of X
+    fill = partial(_fill_row, feature_extractor)
+    if feature_extractor.network:
+        # Network lookups are I/O-bound, so run them concurrently
+        executor = ThreadPoolExecutor(max_workers=NETWORK_WORKERS)
+        results = executor.map(fill, urls, X)
+    else:
+        executor = None
+        results = map(fill, urls, X)
+    if TQDM_AVAILABLE:
+        # Redraws at most once a second instead of printing every 100 URLs
+        results = tqdm(results, total=len(urls), mininterval=1.0, unit='url')
+    
+    try:
+        for i, success in enumerate(results):
+            if not TQDM_AVAILABLE and i % 100 == 0:
+                print(f"Processed {i}/{len(urls)} URLs...")
+            ok[i] = success
+    finally:
+        if executor is not None:
+            executor.shutdown()
     
-    return np.array(features_list), np.array(labels_list)
+    # Only pay for a compacting copy when some URLs failed
+    if not ok.all():
+        X, y = X[ok], y[ok]
+    return X, y
+
+
+def stratified_split(y, test_size=0.2, seed=42):
+    """Stratified (train, test) row indices: one shuffle per class, both in original row order"""
+    rng = np.random.default_rng(seed)
+    is_test = np.zeros(len(y), dtype=bool)
+    for label in np.unique(y):
+        rows = np.flatnonzero(y == label)
+        rng.shuffle(rows)
+        is_test[rows[:int(round(test_size * len(rows)))]] = True
+    return np.flatnonzero(~is_test), np.flatnonzero(is_test)
 
 
 def feature_extractor_to_vector(features):
     """Convert features dict to vector"""
-    feature_order = [
-        'url_length', 'hostname_length', 'path_length', 'query_length',
-        'num_dots', 'num_hyphens', 'num_underscores', 'num_slashes',
-        'num_question_marks', 'num_equals', 'num_ampersands', 'num_percent',
-        'num_at_symbols', 'has_https', 'has_http', 'domain_in_subdomain',
-        'has_ip', 'is_shortened', 'suspicious_tld', 'suspicious_keywords',
-        'has_port', 'num_params', 'has_redirect', 'domain_age',
-        'has_valid_ssl', 'dns_record_count', 'is_typosquatting',
-        'dots_to_length', 'hyphens_to_length'
-    ]
-    
-    vector = []
-    for feature in feature_order:
-        vector.append(features.get(feature, 0))
-    
-    return vector
+    return [features.get(feature, 0) for feature in FEATURE_ORDER]
 
 
 def train_model(phishing_file='data/phishing_urls.txt', 
                 legitimate_file='data/legitimate_urls.txt',
-                model_output='phishsense/models/phishing_model.pkl'):
-    """Train the phishing detection model"""
+                model_output='phishsense/models/phishing_model.pkl',
+                network=False):
+    """
+    Train the phishing detection model
+    
+    Args:
+        phishing_file: Phishing URLs (.txt or .zip)
+        legitimate_file: Legitimate URLs (.txt or .zip)
+        model_output: Where to save the trained model
+        network: Include WHOIS/SSL/DNS features. Off by default because the
+                 per-URL lookups dominate training time on large datasets.
+    """
     
     print("Loading datasets...")
     phishing_urls, legitimate_urls = load_dataset(phishing_file, legitimate_file)
@@ -153,7 +204,7 @@ def train_model(phishing_file='data/phishing_urls.txt',
     all_labels = [1] * len(phishing_urls) + [0] * len(legitimate_urls)
     
     # Extract features
-    feature_extractor = FeatureExtractor() 
+    feature_extractor = FeatureExtractor(network=network)
     X, y = prepare_features(all_urls, all_labels, feature_extractor)
     
     if len(X) == 0:
@@ -164,20 +215,24 @@ def train_model(phishing_file='data/phishing_urls.txt',
     print(f"Feature vector shape: {X.shape}")
     
     # Split data
-    X_train, X_test, y_train, y_test = train_test_split(
-        X, y, test_size=0.2, random_state=42, stratify=y
-    )
+    train_idx, test_idx = stratified_split(y)
+    X_train, X_test = X[train_idx], X[test_idx]
+    y_train, y_test = y[train_idx], y[test_idx]
     
     print(f"\nTraining set: {len(X_train)} samples")
     print(f"Test set: {len(X_test)} samples")
     
-    # Train model
-    print("\nTraining Random Forest model...")
-    model = RandomForestClassifier(
-        n_estimators=100,
-        max_depth=20,
-        random_state=42,
-        n_jobs=-1
+    # Train model: features are binned to uint8 histograms, which keeps the
+    # model far smaller and faster to evaluate than a float64 random forest
+    print("\nTraining Histogram Gradient Boosting model...")
+    model = HistGradientBoostingClassifier(
+        max_iter=200,
+        max_depth=8,
+        learning_rate=0.1,
+        # The default leaf size of 20 allows no split at all on small datasets
+        # (e.g. the bundled sample files); keep it from 2,000 training rows up
+        min_samples_leaf=min(20, max(1, len(X_train) // 100)),
+        random_state=42
     )
     
     model.fit(X_train, y_train)
@@ -196,8 +251,12 @@ def train_model(phishing_file='data/phishing_urls.txt',
     
     # Save model
     os.makedirs(os.path.dirname(model_output), exist_ok=True)
-    with open(model_output, 'wb') as f:
-        pickle.dump(model, f)
+    # Uncompressed so PhishDetector can memory-map the tree arrays on load.
+    # Written beside the target and swapped in: a running detector keeps its
+    # mapping of the old file, which rewriting it in place would corrupt.
+    tmp_path = model_output + '.tmp'
+    joblib.dump(model, tmp_path)
+    os.replace(tmp_path, model_output)
     
     print(f"\nModel saved to {model_output}")
 
@@ -8,16 +8,15 @@ import sys
 import os
 import argparse
 import json
+from concurrent.futures import ThreadPoolExecutor
 
 # Add current directory to path for imports
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from phishsense.detector import PhishDetector
+# PhishDetector (and with it numpy/scikit-learn) is imported in main() after
+# argument parsing, so --help and usage errors return without that import cost
 
-
-def print_banner():
-    """Print PhishSense ASCII art banner"""
-    banner = """
+_BANNER = """
 ╔═══════════════════════════════════════════════════════════════════╗
 ║                                                                   ║
 ║     ██████╗ ██╗  ██╗██╗███████╗██╗  ██╗    ███████╗███████╗███╗   ║
@@ -31,7 +30,68 @@ def print_banner():
 ║                                                                   ║
 ╚═══════════════════════════════════════════════════════════════════╝
     """
-    print(banner)
+
+
+def print_banner():
+    """Print PhishSense ASCII art banner"""
+    print(_BANNER)
+
+
+def result_to_json(result, verbose=False):
+    """Build the JSON-serializable output for one detection result"""
+    output = {
+        'url': result['url'],
+        'is_phishing': result['is_phishing'],
+        'confidence': round(result['confidence'], 3),
+        'threat_level': result['threat_level'],
+        'reasons': result['reasons']
+    }
+    if verbose:
+        output['features'] = result['features']
+        output['heuristic_score'] = round(result['heuristic_score'], 3)
+        if result['ml_score'] is not None:
+            output['ml_score'] = result['ml_score']
+            output['ml_confidence'] = round(result['ml_confidence'], 3)
+    return output
+
+
+def scan_file(detector, file_path, jobs, verbose=False):
+    """
+    Scan every URL in a file concurrently, printing one JSON object per line
+    
+    Returns:
+        int: Exit code - 0 all safe, 1 phishing found, 2 errors occurred
+    """
+    try:
+        with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
+            urls = [line.strip() for line in f if line.strip()]
+    except OSError as e:
+        print(f"Error reading {file_path}: {e}", file=sys.stderr)
+        return 2
+    
+    def detect_one(url):
+        try:
+            return result_to_json(detector.detect(url), verbose)
+        except Exception as e:
+            return {'url': url, 'error': str(e)}
+    
+    found_phishing = False
+    had_errors = False
+    # Detection is dominated by network I/O, so threads overlap well;
+    # all of them share the detector and its loaded model
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        for output in executor.map(detect_one, urls):
+            print(json.dumps(output), flush=True)
+            found_phishing = found_phishing or output.get('is_phishing', False)
+            had_errors = had_errors or 'error' in output
+    
+    if verbose and detector.model is not None:
+        print(f"ML model skipped for {detector.ml_skip_rate:.1%} of URLs "
+              f"(heuristic score decisive)", file=sys.stderr)
+    
+    if had_errors:
+        return 2
+    return 1 if found_phishing else 0
 
 
 def main():
@@ -44,14 +104,34 @@ Examples:
   python phishsense_cli.py https://example.com
   python phishsense_cli.py https://suspicious-site.tk --json
   python phishsense_cli.py https://example.com --verbose
+  python phishsense_cli.py -f urls.txt -j 16 --no-network > results.jsonl
         """
     )
     
     parser.add_argument(
         'url',
+        nargs='?',
         help='URL to check for phishing'
     )
     
+    parser.add_argument(
+        '--file', '-f',
+        help='Scan every URL in a file (one per line); results are printed as JSON lines'
+    )
+    
+    parser.add_argument(
+        '--jobs', '-j',
+        type=int,
+        default=min(32, (os.cpu_count() or 1) * 4),
+        help='Number of URLs scanned concurrently with --file (default: %(default)s)'
+    )
+    
+    parser.add_argument(
+        '--no-network',
+        action='store_true',
+        help='Skip WHOIS/SSL/DNS lookups (much faster; those features count as unknown)'
+    )
+    
     parser.add_argument(
         '--json',
         action='store_true',
@@ -71,38 +151,33 @@ Examples:
     
     args = parser.parse_args()
     
-    # Print banner (skip for JSON output)
-    if not args.json:
+    if (args.url is None) == (args.file is None):
+        parser.error('provide either a URL or --file')
+    if args.jobs < 1:
+        parser.error('--jobs must be at least 1')
+    
+    # Print banner (skip for JSON and JSON-lines output)
+    if not args.json and not args.file:
         print_banner()
     
     # Initialize detector
     try:
-        detector = PhishDetector(model_path=args.model)
+        from phishsense.detector import PhishDetector
+        detector = PhishDetector(model_path=args.model, network=not args.no_network)
     except Exception as e:
         print(f"Error initializing detector: {e}", file=sys.stderr)
         sys.exit(2)
     
+    if args.file:
+        sys.exit(scan_file(detector, args.file, args.jobs, args.verbose))
+    
     # Detect
     try:
         result = detector.detect(args.url)
         
         if args.json:
             # JSON output
-            output = {
-                'url': result['url'],
-                'is_phishing': result['is_phishing'],
-                'confidence': round(result['confidence'], 3),
-                'threat_level': result['threat_level'],
-                'reasons': result['reasons']
-            }
-            if args.verbose:
-                output['features'] = result['features']
-                output['heuristic_score'] = round(result['heuristic_score'], 3)
-                if result['ml_score'] is not None:
-                    output['ml_score'] = result['ml_score']
-                    output['ml_confidence'] = round(result['ml_confidence'], 3)
-            
-            print(json.dumps(output, indent=2))
+            print(json.dumps(result_to_json(result, args.verbose), indent=2))
         else:
             # Human-readable output
             print("\n" + "="*60)